@@ -1,212 +1,297 @@
-from collections import defaultdict
-import datetime
+from dataclasses import dataclass
 
 import dateparser
+import numpy as np
 import pandas as pd
 import streamlit as st
 
 
-def datetime_to_day_index(datetime_obj):
-    return datetime_obj.date()
+def datetimes_to_day_index(datetimes):
+    return datetimes.dt.date
 
 
-def datetime_to_week_index(datetime_obj):
-    return datetime.datetime.strptime(
-        "{}-{}-1".format(datetime_obj.isocalendar()[0], datetime_obj.isocalendar()[1]),
-        "%Y-%W-%w",
-    ).date()
+def datetimes_to_week_index(datetimes):
+    # Weeks are indexed by their Monday
+    return (datetimes - pd.to_timedelta(datetimes.dt.dayofweek, unit="D")).dt.date
 
 
-def datetime_to_month_index(datetime_obj):
-    return datetime_obj.strftime("%Y-%m")
+def datetimes_to_month_index(datetimes):
+    return datetimes.dt.strftime("%Y-%m")
 
 
-def datetime_to_year_index(datetime_obj):
-    return datetime_obj.year
+def datetimes_to_year_index(datetimes):
+    return datetimes.dt.year
+
+
+# The session_state key of each aggregation, mapped to the column it groups by and,
+# for time aggregations, the function that indexes a range of datetimes
+AGGREGATIONS = {
+    "workouts_aggregation_all_time": (None, None),
+    "workouts_aggregation_by_year": ("c_year", datetimes_to_year_index),
+    "workouts_aggregation_by_month": ("c_month", datetimes_to_month_index),
+    "workouts_aggregation_by_week": ("c_week", datetimes_to_week_index),
+    "workouts_aggregation_by_day": ("c_day", datetimes_to_day_index),
+    "workouts_aggregation_by_instructor": ("Instructor Name", None),
+    "workouts_aggregation_by_class_type": ("Type", None),
+    "workouts_aggregation_by_class_length": ("Length (minutes)", None),
+}
+
+
+# Columns added by process_workouts_df for the aggregations, which aren't shown
+INTERNAL_COLUMNS = [
+    "c_duration",
+    "c_distance",
+    "c_weighted_hr",
+    "c_weighted_speed",
+    "c_weighted_cadence",
+    "c_weighted_resistance",
+]
+
+
+def _numeric_column(workouts_df, imperial_column, metric_column):
+    # Exports from metric accounts use kilometers instead of miles
+    if imperial_column in workouts_df:
+        return pd.to_numeric(workouts_df[imperial_column], errors="coerce")
+    return pd.to_numeric(workouts_df[metric_column], errors="coerce") * 0.621371
+
+
+def parse_datetime(date_str):
+    # This is necessary because some Peloton workouts contain timezones
+    # like (-05) which are not well-handled by dateparser
+    return dateparser.parse(date_str.replace("(-", "(GMT-").replace("(+", "(GMT+"))
+
+
+def parse_workout_timestamps(timestamps):
+    # Returns the local (wall-clock) and UTC datetimes of each timestamp. The local
+    # time is the part of the timestamp before the timezone.
+    local_datetimes = pd.to_datetime(
+        timestamps.str.slice(0, 16), format="%Y-%m-%d %H:%M", errors="coerce"
+    )
+
+    # Most timestamps end in a numeric offset like (-05) or (+05:30), which can be
+    # applied to the local time directly
+    offsets = timestamps.str.extract(
+        r"\((?P<sign>[+-])(?P<hours>\d{2}):?(?P<minutes>\d{2})?\)$"
+    )
+    offset_minutes = np.where(offsets["sign"] == "-", -1, 1) * (
+        offsets["hours"].astype(float) * 60 + offsets["minutes"].astype(float).fillna(0)
+    )
+    utc_datetimes = (
+        local_datetimes - pd.to_timedelta(offset_minutes, unit="m")
+    ).dt.tz_localize("UTC")
+
+    # Fall back to dateparser for timestamps in any other format, or with a named
+    # timezone like (EST). This covers every row without a local time too.
+    unparsed = utc_datetimes.isna()
+    if unparsed.any():
+        parsed = timestamps[unparsed].apply(parse_datetime)
+        utc_datetimes[unparsed] = pd.to_datetime(parsed, utc=True)
+        local_datetimes[unparsed] = pd.to_datetime(
+            parsed.apply(
+                lambda datetime_obj: datetime_obj and datetime_obj.replace(tzinfo=None)
+            )
+        )
+    return local_datetimes, utc_datetimes
 
 
 def process_workouts_df():
     # Bail out if we don't have a workouts_df on the session_state
     if "workouts_df" not in st.session_state:
         return
+    # Columns are added to the DF held by session_state in place, so it doesn't need
+    # to be reassigned after processing
     workouts_df = st.session_state["workouts_df"]
 
-    # Convert to datetime
-    def parse_datetime(date_str):
-        # This is necessary because some Peloton workouts contain timezones
-        # like (-05) which are not well-handled by dateparser
-        return dateparser.parse(date_str.replace("(-", "(GMT-").replace("(+", "(GMT+"))
-
-    # Parse the various versions of the Workout's Timestamp
-    workouts_df["c_datetime"] = workouts_df["Workout Timestamp"].apply(
-        lambda x: parse_datetime(x)
-    )
-    workouts_df["c_day"] = workouts_df["c_datetime"].apply(datetime_to_day_index)
-    workouts_df["c_week"] = workouts_df["c_datetime"].apply(datetime_to_week_index)
-    workouts_df["c_month"] = workouts_df["c_datetime"].apply(datetime_to_month_index)
-    workouts_df["c_year"] = workouts_df["c_datetime"].apply(datetime_to_year_index)
-    workouts_df["c_datetime"] = pd.to_datetime(workouts_df["c_datetime"], utc=True)
-
-    date_range = pd.Series(
-        pd.date_range(start=workouts_df["c_day"].min(), end=workouts_df["c_day"].max())
+    # Parse the various versions of the Workout's Timestamp. The indices use the local
+    # time of the workout.
+    local_datetimes, workouts_df["c_datetime"] = parse_workout_timestamps(
+        workouts_df["Workout Timestamp"]
     )
+    workouts_df["c_day"] = datetimes_to_day_index(local_datetimes)
+    workouts_df["c_week"] = datetimes_to_week_index(local_datetimes)
+    workouts_df["c_month"] = datetimes_to_month_index(local_datetimes)
+    workouts_df["c_year"] = datetimes_to_year_index(local_datetimes)
 
-    # After processing, reassign the processed DF to session_state
-    st.session_state["workouts_df"] = workouts_df
-    st.session_state["workouts_aggregation_all_time"] = Aggregation(workouts_df)
-    st.session_state["workouts_aggregation_by_year"] = Aggregation(
-        workouts_df, "c_year", extra_indices=date_range.apply(datetime_to_year_index)
-    )
-    st.session_state["workouts_aggregation_by_month"] = Aggregation(
-        workouts_df, "c_month", extra_indices=date_range.apply(datetime_to_month_index)
-    )
-    st.session_state["workouts_aggregation_by_week"] = Aggregation(
-        workouts_df, "c_week", extra_indices=date_range.apply(datetime_to_week_index)
-    )
-    st.session_state["workouts_aggregation_by_day"] = Aggregation(
-        workouts_df, "c_day", extra_indices=date_range.apply(datetime_to_day_index)
-    )
-    st.session_state["workouts_aggregation_by_instructor"] = Aggregation(
-        workouts_df, "Instructor Name"
+    distance = _numeric_column(workouts_df, "Distance (mi)", "Distance (km)")
+    speed = _numeric_column(workouts_df, "Avg. Speed (mph)", "Avg. Speed (kph)")
+
+    # Length is "None" for scenic rides, so their duration is estimated from the
+    # distance and speed instead
+    length = workouts_df["Length (minutes)"]
+    duration = np.trunc(pd.to_numeric(length, errors="coerce")).where(
+        length != "None", distance / speed * 60
     )
-    st.session_state["workouts_aggregation_by_class_type"] = Aggregation(
-        workouts_df, "Type"
+    resistance = pd.to_numeric(
+        workouts_df["Avg. Resistance"].astype(str).str.strip("%"), errors="coerce"
     )
-    st.session_state["workouts_aggregation_by_class_length"] = Aggregation(
-        workouts_df, "Length (minutes)"
+    workouts_df["c_duration"] = duration
+    workouts_df["c_distance"] = distance
+
+    # Averages are weighted by the workout duration, so precompute the weighted values
+    workouts_df["c_weighted_hr"] = duration.mul(workouts_df["Avg. Heartrate"])
+    workouts_df["c_weighted_speed"] = duration.mul(speed)
+    workouts_df["c_weighted_cadence"] = duration.mul(workouts_df["Avg. Cadence (RPM)"])
+    workouts_df["c_weighted_resistance"] = duration.mul(resistance)
+
+    # Aggregations are built on demand, so drop any built from a previous upload
+    for key in AGGREGATIONS:
+        if key in st.session_state:
+            del st.session_state[key]
+
+    st.session_state["workout_arrays"] = WorkoutArrays.from_workouts_df(workouts_df)
+
+    # Number the groups of every aggregation once, coding invalid keys as -1
+    group_codes = {
+        None: (np.zeros(len(workouts_df), dtype=np.intp), pd.Index(["All Time"]))
+    }
+    for group_by, _ in AGGREGATIONS.values():
+        if group_by is not None:
+            group_codes[group_by] = pd.factorize(workouts_df[group_by])
+    st.session_state["workouts_group_codes"] = group_codes
+
+
+def get_aggregation(key):
+    # Bail out if we don't have a workouts_df on the session_state
+    if "workouts_df" not in st.session_state:
+        return None
+
+    # Each aggregation is kept in this session's state, so it is only built once per
+    # upload no matter how often Streamlit reruns the script
+    if key not in st.session_state:
+        workouts_df = st.session_state["workouts_df"]
+        group_by, datetimes_to_index = AGGREGATIONS[key]
+
+        # Time aggregations include every period between the first and last workout
+        extra_indices = None
+        if datetimes_to_index is not None:
+            date_range = pd.Series(
+                pd.date_range(
+                    start=workouts_df["c_day"].min(), end=workouts_df["c_day"].max()
+                )
+            )
+            extra_indices = datetimes_to_index(date_range)
+
+        codes, uniques = st.session_state["workouts_group_codes"][group_by]
+        st.session_state[key] = Aggregation(
+            st.session_state["workout_arrays"], codes, uniques, extra_indices
+        )
+    return st.session_state[key]
+
+
+# The columns of WorkoutArrays.values. The averaged metrics are followed by the minutes
+# they were recorded for, which are the denominators of their averages.
+AVERAGED_COLUMNS = ["output", "calories", "hr", "speed", "cadence", "resistance"]
+SUMMED_COLUMNS = (
+    ["minutes", "distance"]
+    + AVERAGED_COLUMNS
+    + [column + "_minutes" for column in AVERAGED_COLUMNS]
+)
+
+
+# The per-workout values that every aggregation sums, extracted once per upload.
+# Missing values are stored as zeros, so they can be summed without any masking. The
+# values are stored as float32 to halve their size, but are summed in float64.
+@dataclass
+class WorkoutArrays:
+    values: np.ndarray
+
+    @classmethod
+    def from_workouts_df(cls, workouts_df):
+        metrics = workouts_df[
+            [
+                "c_duration",
+                "c_distance",
+                "Total Output",
+                "Calories Burned",
+                "c_weighted_hr",
+                "c_weighted_speed",
+                "c_weighted_cadence",
+                "c_weighted_resistance",
+            ]
+        ].to_numpy(dtype=np.float32)
+        present = ~np.isnan(metrics)
+
+        # Averaged metrics only count when both the metric and the duration exist
+        duration = metrics[:, [0]]
+        averaged_present = present[:, 2:] & present[:, [0]]
+
+        return cls(
+            values=np.hstack(
+                [
+                    np.where(present[:, :2], metrics[:, :2], 0.0),
+                    np.where(averaged_present, metrics[:, 2:], 0.0),
+                    np.where(averaged_present, duration, 0.0),
+                ]
+            ).astype(np.float32)
+        )
+
+
+def compute_aggregation(workout_arrays, codes, uniques, extra_indices=None):
+    # Skip workouts with an invalid key, which are coded as -1
+    in_group = codes >= 0
+
+    # Give every (group, column) pair its own bin so that all of the sums are reduced
+    # in a single bincount pass over the values, which accumulates in float64
+    n_columns = len(SUMMED_COLUMNS)
+    bins = codes[in_group, np.newaxis] * n_columns + np.arange(n_columns)
+    sums = np.bincount(
+        bins.ravel(),
+        weights=workout_arrays.values[in_group].ravel(),
+        minlength=len(uniques) * n_columns,
     )
 
+    sums = sums.reshape(len(uniques), n_columns)
+    workouts = np.bincount(codes[in_group], minlength=len(uniques))
+
+    # Pad the groups with any extra indices that have no workouts
+    index = uniques
+    if extra_indices is not None:
+        index = uniques.union(pd.Index(extra_indices).unique())
+        positions = index.get_indexer(uniques)
+        padded_sums = np.zeros((len(index), n_columns))
+        padded_sums[positions] = sums
+        padded_workouts = np.zeros(len(index), dtype=workouts.dtype)
+        padded_workouts[positions] = workouts
+        sums, workouts = padded_sums, padded_workouts
+
+    totals = dict(zip(SUMMED_COLUMNS, sums.T))
+
+    def average(column):
+        minutes = totals[column + "_minutes"]
+        return np.divide(
+            totals[column], minutes, out=np.full(len(index), np.nan), where=minutes > 0
+        )
+
+    return pd.DataFrame(
+        {
+            "Total Workouts": workouts,
+            "Total Minutes": totals["minutes"],
+            "Total Distance": totals["distance"],
+            "Total Output": totals["output"],
+            "Total Calories": totals["calories"],
+            "Avg. Output (watts)": (100.0 / 6.0) * average("output"),
+            "Avg. Output (kj/m)": average("output"),
+            "Avg. Calories per Minute": average("calories"),
+            "Avg. Heartrate": average("hr"),
+            "Avg. Speed (mph)": average("speed"),
+            "Avg. Cadence (RPM)": average("cadence"),
+            "Avg. Resistance": average("resistance"),
+        },
+        index=index,
+    ).sort_index()
+
 
 class Aggregation(object):
     def __init__(
         self,
-        workouts_df,
-        group_by=None,
+        workout_arrays,
+        codes,
+        uniques,
         extra_indices=None,
     ):
-        self.group_by = group_by
-
-        # These accumulators hold the values over the iterations
-        total_workouts = defaultdict(lambda: 0)
-        total_time = defaultdict(lambda: 0.0)
-        total_distance = defaultdict(lambda: 0.0)
-        total_output = defaultdict(lambda: 0.0)
-        total_output_minutes = defaultdict(lambda: 0.0)
-        total_calories = defaultdict(lambda: 0.0)
-        total_calories_minutes = defaultdict(lambda: 0.0)
-        total_hr = defaultdict(lambda: 0.0)
-        total_hr_minutes = defaultdict(lambda: 0.0)
-        total_speed = defaultdict(lambda: 0.0)
-        total_speed_minutes = defaultdict(lambda: 0.0)
-        total_cadence = defaultdict(lambda: 0.0)
-        total_cadence_minutes = defaultdict(lambda: 0.0)
-        total_resistance = defaultdict(lambda: 0.0)
-        total_resistance_minutes = defaultdict(lambda: 0.0)
-
-        if extra_indices is not None:
-            for index in extra_indices:
-                total_workouts[index] = 0
-                total_time[index] = 0.0
-                total_distance[index] = 0.0
-                total_output[index] = 0.0
-                total_output_minutes[index] = 0.0
-                total_calories[index] = 0.0
-                total_calories_minutes[index] = 0.0
-                total_hr[index] = 0.0
-                total_hr_minutes[index] = 0.0
-                total_speed[index] = 0.0
-                total_speed_minutes[index] = 0.0
-                total_cadence[index] = 0.0
-                total_cadence_minutes[index] = 0.0
-                total_resistance[index] = 0.0
-                total_resistance_minutes[index] = 0.0
-
-        for _, row in workouts_df.iterrows():
-            # Get the value for the group_by column
-            if group_by:
-                key = row[group_by]
-
-                # Skip rows with an invalid key
-                if pd.isnull(key):
-                    continue
-            else:
-                key = "All Time"
-
-            # Update the accumulators
-            total_workouts[key] += 1
-            try:
-                if not pd.isna(row["Distance (mi)"]):
-                    total_distance[key] += row["Distance (mi)"]
-            except KeyError:
-                if not pd.isna(row["Distance (km)"]):
-                    total_distance[key] += row["Distance (km)"] * 0.621371
-
-            duration = None
-            if not pd.isna(row["Length (minutes)"]) and (
-                row["Length (minutes)"] != "None"
-            ):
-                duration = int(row["Length (minutes)"])
-            elif row["Length (minutes)"] == "None":
-                duration = (row["Distance (mi)"] / row["Avg. Speed (mph)"]) * 60
-
-            if duration is not None:
-                total_time[key] += duration
-                # These are nested inside the Length if-clause because we need to
-                # weight the values by the workout length. Length is missing for scenic
-                #  rides.
-                if not pd.isna(row["Total Output"]):
-                    total_output[key] += row["Total Output"]
-                    total_output_minutes[key] += duration
-                if not pd.isna(row["Calories Burned"]):
-                    total_calories[key] += row["Calories Burned"]
-                    total_calories_minutes[key] += duration
-                if not pd.isna(row["Avg. Heartrate"]):
-                    total_hr[key] += duration * row["Avg. Heartrate"]
-                    total_hr_minutes[key] += duration
-
-                try:
-                    if not pd.isna(row["Avg. Speed (mph)"]):
-                        total_speed[key] += duration * row["Avg. Speed (mph)"]
-                        total_speed_minutes[key] += duration
-                except KeyError:
-                    if not pd.isna(row["Avg. Speed (kph)"]):
-                        total_speed[key] += (
-                            duration * row["Avg. Speed (kph)"] * 0.621371
-                        )
-                        total_speed_minutes[key] += duration
-
-                if not pd.isna(row["Avg. Cadence (RPM)"]):
-                    total_cadence[key] += duration * row["Avg. Cadence (RPM)"]
-                    total_cadence_minutes[key] += duration
-                if not pd.isna(row["Avg. Resistance"]):
-                    total_resistance[key] += duration * float(
-                        row["Avg. Resistance"].strip("%")
-                    )
-                    total_resistance_minutes[key] += duration
-
-        self.aggregated_df = pd.DataFrame(
-            {
-                "Total Workouts": pd.Series(total_workouts),
-                "Total Minutes": pd.Series(total_time),
-                "Total Distance": pd.Series(total_distance),
-                "Total Output": pd.Series(total_output),
-                "Total Calories": pd.Series(total_calories),
-                "Avg. Output (watts)": (100.0 / 6.0)
-                * pd.Series(total_output)
-                / pd.Series(total_output_minutes),
-                "Avg. Output (kj/m)": pd.Series(total_output)
-                / pd.Series(total_output_minutes),
-                "Avg. Calories per Minute": pd.Series(total_calories)
-                / pd.Series(total_calories_minutes),
-                "Avg. Heartrate": pd.Series(total_hr) / pd.Series(total_hr_minutes),
-                "Avg. Speed (mph)": pd.Series(total_speed)
-                / pd.Series(total_speed_minutes),
-                "Avg. Cadence (RPM)": pd.Series(total_cadence)
-                / pd.Series(total_cadence_minutes),
-                "Avg. Resistance": pd.Series(total_resistance)
-                / pd.Series(total_resistance_minutes),
-            }
-        ).sort_index()
+        self.aggregated_df = compute_aggregation(
+            workout_arrays, codes, uniques, extra_indices
+        )
         self.styled_aggregated_df = self.aggregated_df.style.format(
             {
                 "Total Workouts": "{:,.0f}",
@@ -1,12 +1,47 @@
+import hashlib
+
 import pandas as pd
 import streamlit as st
 import streamlit_analytics as sta
 
-from aggregation import process_workouts_df
+from aggregation import INTERNAL_COLUMNS, get_aggregation, process_workouts_df
 from render_stats_by_time import render_stats_by_time
 from render_stats_by_class import render_stats_by_class
 from render_stats_all_time import render_stats_all_time
 
+# The columns of the Peloton workouts export that are used or shown in the workouts
+# table. Exports from metric accounts have distances and speeds in km and kph.
+WORKOUT_COLUMNS = [
+    "Workout Timestamp",
+    "Title",
+    "Class Timestamp",
+    "Avg. Watts",
+    "Live/On-Demand",
+    "Instructor Name",
+    "Length (minutes)",
+    "Fitness Discipline",
+    "Type",
+    "Total Output",
+    "Avg. Heartrate",
+    "Avg. Cadence (RPM)",
+    "Avg. Resistance",
+    "Avg. Speed (mph)",
+    "Avg. Speed (kph)",
+    "Distance (mi)",
+    "Distance (km)",
+    "Calories Burned",
+]
+WORKOUT_DTYPES = {
+    "Total Output": "float32",
+    "Avg. Heartrate": "float32",
+    "Avg. Cadence (RPM)": "float32",
+    "Avg. Speed (mph)": "float32",
+    "Avg. Speed (kph)": "float32",
+    "Distance (mi)": "float32",
+    "Distance (km)": "float32",
+    "Calories Burned": "float32",
+}
+
 
 def render_upload_workouts():
     st.title("Upload Workouts")
@@ -30,69 +65,88 @@ def render_upload_workouts():
     if ("workouts_df" in st.session_state) and (raw_workouts is None):
         workouts_df = st.session_state["workouts_df"]
 
+    # Streamlit keeps the uploaded file across reruns, so only process it when its
+    # contents have changed
+    is_new_upload = False
     if raw_workouts is not None:
-        workouts_df = pd.read_csv(raw_workouts)
-        workouts_df = workouts_df[workouts_df["Fitness Discipline"] == "Cycling"]
+        workouts_hash = hashlib.blake2b(
+            raw_workouts.getvalue(), digest_size=16
+        ).hexdigest()
+        is_new_upload = workouts_hash != st.session_state.get("workouts_hash")
+
+    if is_new_upload:
+        # Read in chunks, keeping only the Cycling workouts, so other disciplines
+        # are never held in memory or processed
+        workouts_df = pd.concat(
+            chunk[chunk["Fitness Discipline"] == "Cycling"]
+            for chunk in pd.read_csv(
+                raw_workouts,
+                usecols=lambda column: column in WORKOUT_COLUMNS,
+                dtype=WORKOUT_DTYPES,
+                chunksize=10000,
+            )
+        )
         st.session_state["workouts_df"] = workouts_df
 
-        # Whether-or-not we've uploaded, process the DF
+        # Process the newly uploaded DF
         st.markdown("Processing your workouts...")
         process_workouts_df()
         st.markdown("{} workouts processed!".format(len(workouts_df)))
+        st.session_state["workouts_hash"] = workouts_hash
 
     if "workouts_df" in st.session_state:
         st.subheader(
             "Upload complete! Use the tools in the sidebar to analyze your workouts."
         )
         st.subheader("Cycling Workouts")
-        st.dataframe(st.session_state["workouts_df"])
+        st.dataframe(st.session_state["workouts_df"].drop(columns=INTERNAL_COLUMNS))
 
 
 def render_stats_by_year():
     return render_stats_by_time(
-        aggregation=st.session_state.get("workouts_aggregation_by_year", None),
+        aggregation=get_aggregation("workouts_aggregation_by_year"),
         readable_time_unit="Year",
     )
 
 
 def render_stats_by_month():
     return render_stats_by_time(
-        aggregation=st.session_state.get("workouts_aggregation_by_month", None),
+        aggregation=get_aggregation("workouts_aggregation_by_month"),
         readable_time_unit="Month",
     )
 
 
 def render_stats_by_week():
     return render_stats_by_time(
-        aggregation=st.session_state.get("workouts_aggregation_by_week", None),
+        aggregation=get_aggregation("workouts_aggregation_by_week"),
         readable_time_unit="Week",
     )
 
 
 def render_stats_by_day():
     return render_stats_by_time(
-        aggregation=st.session_state.get("workouts_aggregation_by_day", None),
+        aggregation=get_aggregation("workouts_aggregation_by_day"),
         readable_time_unit="Day",
     )
 
 
 def render_stats_by_instructor():
     return render_stats_by_class(
-        aggregation=st.session_state.get("workouts_aggregation_by_instructor", None),
+        aggregation=get_aggregation("workouts_aggregation_by_instructor"),
         readable_class_characteristic="Instructor",
     )
 
 
 def render_stats_by_class_type():
     return render_stats_by_class(
-        aggregation=st.session_state.get("workouts_aggregation_by_class_type", None),
+        aggregation=get_aggregation("workouts_aggregation_by_class_type"),
         readable_class_characteristic="Class Type",
     )
 
 
 def render_stats_by_class_length():
     return render_stats_by_class(
-        aggregation=st.session_state.get("workouts_aggregation_by_class_length", None),
+        aggregation=get_aggregation("workouts_aggregation_by_class_length"),
         readable_class_characteristic="Class Length",
     )
 
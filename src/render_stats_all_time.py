@@ -1,5 +1,7 @@
 import streamlit as st
 
+from aggregation import get_aggregation
+
 
 def render_stats_all_time():
     st.title("All-Time Stats")
@@ -11,13 +13,14 @@ def render_stats_all_time():
         return
 
     workouts_df = st.session_state["workouts_df"]
-    all_time_df = st.session_state["workouts_aggregation_all_time"].aggregated_df
+    all_time_aggregation = get_aggregation("workouts_aggregation_all_time")
+    all_time_df = all_time_aggregation.aggregated_df
 
-    st.dataframe(st.session_state["workouts_aggregation_all_time"].styled_aggregated_df)
+    st.dataframe(all_time_aggregation.styled_aggregated_df)
 
     n_workouts = all_time_df["Total Workouts"].sum()
     n_instructors = len(
-        st.session_state["workouts_aggregation_by_instructor"].aggregated_df
+        get_aggregation("workouts_aggregation_by_instructor").aggregated_df
     )
     n_live = len(workouts_df[workouts_df["Live/On-Demand"] == "Live"])
     n_on_demand = len(workouts_df[workouts_df["Live/On-Demand"] == "On Demand"])
@@ -42,7 +45,7 @@ def render_stats_all_time():
             total_hrs,
             total_days,
             total_miles,
-            all_time_df["Avg. Speed (mph)"].mean(),
+            all_time_df["Avg. Speed (mph)"].iloc[0],
         )
     )
 
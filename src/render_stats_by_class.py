@@ -3,6 +3,40 @@ import plotly.express as px
 
 from aggregation import Aggregation
 
+# The columns charted as bars; each is sorted descending once in sorted_views
+BAR_COLUMNS = [
+    "Avg. Output (watts)",
+    "Avg. Calories per Minute",
+    "Avg. Speed (mph)",
+    "Avg. Heartrate",
+    "Avg. Resistance",
+    "Avg. Cadence (RPM)",
+    "Total Minutes",
+    "Total Workouts",
+    "Total Output",
+    "Total Calories",
+    "Total Distance",
+]
+
+
+def render_bar(
+    sorted_values, readable_value, readable_class_characteristic, log_y=False
+):
+    fig = px.bar(
+        sorted_values,
+        title="{} by {}".format(readable_value, readable_class_characteristic),
+        labels={
+            "index": readable_class_characteristic,
+            "value": readable_value,
+        },
+        log_y=log_y,
+    )
+    fig.update_xaxes(showgrid=False)
+    fig.update_yaxes(showgrid=False)
+    fig.update_layout(plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)")
+    fig.update_layout(showlegend=False)
+    st.plotly_chart(fig, use_container_width=True)
+
 
 def render_stats_by_class(aggregation: Aggregation, readable_class_characteristic: str):
     st.title("Stats By {}".format(readable_class_characteristic))
@@ -29,6 +63,12 @@ def render_stats_by_class(aggregation: Aggregation, readable_class_characteristi
             + "types and very few workouts of other types."
         )
 
+    # Sort each charted column once, dropping classes without a value
+    sorted_views = {
+        column: aggregation.aggregated_df[column].dropna().sort_values(ascending=False)
+        for column in BAR_COLUMNS
+    }
+
     # When slicing by Instructor, this helps visualize without as much crowding
     scatter_text = aggregation.aggregated_df.index.to_series()
     if readable_class_characteristic == "Instructor":
@@ -136,255 +176,90 @@ def render_stats_by_class(aggregation: Aggregation, readable_class_characteristi
 
         c1, c2 = st.columns(2)
         with c1:
-            sorted_opm = aggregation.aggregated_df["Avg. Output (watts)"].sort_values(
-                ascending=False
-            )
-            fig = px.bar(
-                sorted_opm,
-                title="Avg. Output (watts) by {}".format(readable_class_characteristic),
-                labels={
-                    "index": readable_class_characteristic,
-                    "value": "Avg. Output (watts)",
-                },
+            render_bar(
+                sorted_views["Avg. Output (watts)"],
+                "Avg. Output (watts)",
+                readable_class_characteristic,
             )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
         with c2:
-            sorted_cpm = aggregation.aggregated_df[
-                "Avg. Calories per Minute"
-            ].sort_values(ascending=False)
-            fig = px.bar(
-                sorted_cpm,
-                title="Avg. Calories per Minute by {}".format(
-                    readable_class_characteristic
-                ),
-                labels={
-                    "index": readable_class_characteristic,
-                    "value": "Avg. Calories per Minute",
-                },
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
+            render_bar(
+                sorted_views["Avg. Calories per Minute"],
+                "Avg. Calories per Minute",
+                readable_class_characteristic,
             )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
 
         c1, c2 = st.columns(2)
         with c1:
-            sorted_distance = (
-                aggregation.aggregated_df["Avg. Speed (mph)"]
-                .sort_values(ascending=False)
-                .dropna()
-            )
-            fig = px.bar(
-                sorted_distance,
-                title="Avg. Speed (mph) by {}".format(readable_class_characteristic),
-                labels={
-                    "index": readable_class_characteristic,
-                    "value": "Avg. Speed (mph)",
-                },
+            render_bar(
+                sorted_views["Avg. Speed (mph)"],
+                "Avg. Speed (mph)",
+                readable_class_characteristic,
                 log_y=log_scale,
             )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
         with c2:
-            sorted_calories = (
-                aggregation.aggregated_df["Avg. Heartrate"]
-                .sort_values(ascending=False)
-                .dropna()
-            )
-            fig = px.bar(
-                sorted_calories,
-                title="Avg. Heartrate by {}".format(readable_class_characteristic),
-                labels={
-                    "index": readable_class_characteristic,
-                    "value": "Avg. Heartrate",
-                },
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
+            render_bar(
+                sorted_views["Avg. Heartrate"],
+                "Avg. Heartrate",
+                readable_class_characteristic,
             )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
 
         c1, c2 = st.columns(2)
         with c1:
-            sorted_resistance = (
-                aggregation.aggregated_df["Avg. Resistance"]
-                .sort_values(ascending=False)
-                .dropna()
-            )
-            fig = px.bar(
-                sorted_resistance,
-                title="Avg. Resistance (%) by {}".format(readable_class_characteristic),
-                labels={
-                    "index": readable_class_characteristic,
-                    "value": "Avg. Resistance (%)",
-                },
+            render_bar(
+                sorted_views["Avg. Resistance"],
+                "Avg. Resistance (%)",
+                readable_class_characteristic,
                 log_y=log_scale,
             )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
         with c2:
-            sorted_cadence = (
-                aggregation.aggregated_df["Avg. Cadence (RPM)"]
-                .sort_values(ascending=False)
-                .dropna()
-            )
-            fig = px.bar(
-                sorted_cadence,
-                title="Avg. Cadence (RPM) by {}".format(readable_class_characteristic),
-                labels={
-                    "index": readable_class_characteristic,
-                    "value": "Avg. Cadence (RPM)",
-                },
+            render_bar(
+                sorted_views["Avg. Cadence (RPM)"],
+                "Avg. Cadence (RPM)",
+                readable_class_characteristic,
                 log_y=log_scale,
             )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
 
     with st.expander("Visualize Totals", expanded=True):
 
         c1, c2 = st.columns(2)
         with c1:
-            sorted_minutes = aggregation.aggregated_df["Total Minutes"].sort_values(
-                ascending=False
-            )
-            fig = px.bar(
-                sorted_minutes,
-                title="Total Minutes by {}".format(readable_class_characteristic),
-                labels={
-                    "index": readable_class_characteristic,
-                    "value": "Total Minutes",
-                },
+            render_bar(
+                sorted_views["Total Minutes"],
+                "Total Minutes",
+                readable_class_characteristic,
                 log_y=log_scale,
             )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
         with c2:
-            sorted_workouts = (
-                aggregation.aggregated_df["Total Workouts"]
-                .sort_values(ascending=False)
-                .dropna()
-            )
-            fig = px.bar(
-                sorted_workouts,
-                title="Total Workouts by {}".format(readable_class_characteristic),
-                labels={
-                    "index": readable_class_characteristic,
-                    "value": "Total Workouts",
-                },
+            render_bar(
+                sorted_views["Total Workouts"],
+                "Total Workouts",
+                readable_class_characteristic,
                 log_y=log_scale,
             )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
 
         c1, c2 = st.columns(2)
         with c1:
-            sorted_output = (
-                aggregation.aggregated_df["Total Output"]
-                .sort_values(ascending=False)
-                .dropna()
-            )
-            fig = px.bar(
-                sorted_output,
-                title="Total Output by {}".format(readable_class_characteristic),
-                labels={
-                    "index": readable_class_characteristic,
-                    "value": "Total Output",
-                },
+            render_bar(
+                sorted_views["Total Output"],
+                "Total Output",
+                readable_class_characteristic,
                 log_y=log_scale,
             )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
         with c2:
-            sorted_calories = (
-                aggregation.aggregated_df["Total Calories"]
-                .sort_values(ascending=False)
-                .dropna()
-            )
-            fig = px.bar(
-                sorted_calories,
-                title="Total Calories by {}".format(readable_class_characteristic),
-                labels={
-                    "index": readable_class_characteristic,
-                    "value": "Total Calories",
-                },
+            render_bar(
+                sorted_views["Total Calories"],
+                "Total Calories",
+                readable_class_characteristic,
                 log_y=log_scale,
             )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
 
         c1, c2 = st.columns(2)
         with c1:
-            sorted_distance = (
-                aggregation.aggregated_df["Total Distance"]
-                .sort_values(ascending=False)
-                .dropna()
-            )
-            fig = px.bar(
-                sorted_distance,
-                title="Total Distance by {}".format(readable_class_characteristic),
-                labels={
-                    "index": readable_class_characteristic,
-                    "value": "Total Distance",
-                },
+            render_bar(
+                sorted_views["Total Distance"],
+                "Total Distance",
+                readable_class_characteristic,
                 log_y=log_scale,
             )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
         with c2:
             st.empty()
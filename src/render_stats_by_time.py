@@ -2,6 +2,39 @@ import streamlit as st
 import plotly.express as px
 
 
+def render_line_facets(aggregated_df, titles, readable_time_unit):
+    # Plot every column in one faceted figure, titling each facet by its column
+    long_df = (
+        aggregated_df[list(titles)]
+        .rename(columns=titles)
+        .reset_index()
+        .melt(id_vars="index", var_name="metric")
+    )
+
+    # Drop missing values so lines join across gaps, but keep the rows of metrics
+    # with no values at all (e.g. no heart rate monitor) so their facet still shows
+    has_values = long_df.groupby("metric")["value"].transform("count") > 0
+    long_df = long_df[long_df["value"].notna() | ~has_values]
+
+    fig = px.line(
+        long_df,
+        x="index",
+        y="value",
+        facet_col="metric",
+        facet_col_wrap=2,
+        category_orders={"metric": list(titles.values())},
+        facet_row_spacing=0.1,
+        labels={"index": f"{readable_time_unit}", "value": ""},
+        height=350 * ((len(titles) + 1) // 2),
+    )
+    fig.for_each_annotation(lambda a: a.update(text=a.text.split("=", 1)[-1]))
+    fig.update_xaxes(showgrid=False, showticklabels=True)
+    fig.update_yaxes(showgrid=False, showticklabels=True, matches=None)
+    fig.update_layout(plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)")
+    fig.update_layout(showlegend=False)
+    st.plotly_chart(fig, use_container_width=True)
+
+
 def render_stats_by_time(aggregation, readable_time_unit):
     st.title(f"Stats By {readable_time_unit}")
 
@@ -22,164 +55,27 @@ def render_stats_by_time(aggregation, readable_time_unit):
         return
 
     with st.expander("Visualize Averages", expanded=True):
-        c1, c2 = st.columns(2)
-        with c1:
-            fig = px.line(
-                aggregation.aggregated_df["Avg. Resistance"].dropna(),
-                title="Avg. Resistance (%) by {}".format(readable_time_unit),
-                labels={
-                    "index": f"{readable_time_unit}",
-                    "value": "Avg. Resistance (%)",
-                },
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
-        with c2:
-            fig = px.line(
-                aggregation.aggregated_df["Avg. Cadence (RPM)"].dropna(),
-                title="Avg. Cadence (RPM) by {}".format(readable_time_unit),
-                labels={
-                    "index": f"{readable_time_unit}",
-                    "value": "Avg. Cadence (RPM)",
-                },
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
-        c1, c2 = st.columns(2)
-        with c1:
-            fig = px.line(
-                aggregation.aggregated_df["Avg. Speed (mph)"].dropna(),
-                title="Avg. Speed (mph) by {}".format(readable_time_unit),
-                labels={"index": f"{readable_time_unit}", "value": "Avg. Speed (mph)"},
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
-        with c2:
-            fig = px.line(
-                aggregation.aggregated_df["Avg. Output (watts)"].dropna(),
-                title="Avg. Output (watts) by {}".format(readable_time_unit),
-                labels={
-                    "index": f"{readable_time_unit}",
-                    "value": "Avg. Output (watts)",
-                },
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
-        c1, c2 = st.columns(2)
-        with c1:
-            fig = px.line(
-                aggregation.aggregated_df["Avg. Heartrate"].dropna(),
-                title="Avg. Heartrate by {}".format(readable_time_unit),
-                labels={"index": f"{readable_time_unit}", "value": "Avg. Heartrate"},
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
-        with c2:
-            st.empty()
+        render_line_facets(
+            aggregation.aggregated_df,
+            {
+                "Avg. Resistance": f"Avg. Resistance (%) by {readable_time_unit}",
+                "Avg. Cadence (RPM)": f"Avg. Cadence (RPM) by {readable_time_unit}",
+                "Avg. Speed (mph)": f"Avg. Speed (mph) by {readable_time_unit}",
+                "Avg. Output (watts)": f"Avg. Output (watts) by {readable_time_unit}",
+                "Avg. Heartrate": f"Avg. Heartrate by {readable_time_unit}",
+            },
+            readable_time_unit,
+        )
 
     with st.expander("Visualize Totals", expanded=True):
-        c1, c2 = st.columns(2)
-        with c1:
-            fig = px.line(
-                aggregation.aggregated_df["Total Minutes"].dropna(),
-                title="Total Minutes per {}".format(readable_time_unit),
-                labels={"index": f"{readable_time_unit}", "value": "Total Minutes"},
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
-        with c2:
-            fig = px.line(
-                aggregation.aggregated_df["Total Output"].dropna(),
-                title="Total Output per {}".format(readable_time_unit),
-                labels={"index": f"{readable_time_unit}", "value": "Total Output"},
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
-        c1, c2 = st.columns(2)
-        with c1:
-            fig = px.line(
-                aggregation.aggregated_df["Total Calories"].dropna(),
-                title="Total Calories per {}".format(readable_time_unit),
-                labels={"index": f"{readable_time_unit}", "value": "Total Calories"},
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
-        with c2:
-            fig = px.line(
-                aggregation.aggregated_df["Total Distance"].dropna(),
-                title="Total Distance per {}".format(readable_time_unit),
-                labels={"index": f"{readable_time_unit}", "value": "Total Distance"},
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
-        c1, c2 = st.columns(2)
-        with c1:
-            fig = px.line(
-                aggregation.aggregated_df["Total Workouts"].dropna(),
-                title="Total Workouts per {}".format(readable_time_unit),
-                labels={"index": f"{readable_time_unit}", "value": "Total Workouts"},
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=False)
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-
-        with c2:
-            st.empty()
+        render_line_facets(
+            aggregation.aggregated_df,
+            {
+                "Total Minutes": f"Total Minutes per {readable_time_unit}",
+                "Total Output": f"Total Output per {readable_time_unit}",
+                "Total Calories": f"Total Calories per {readable_time_unit}",
+                "Total Distance": f"Total Distance per {readable_time_unit}",
+                "Total Workouts": f"Total Workouts per {readable_time_unit}",
+            },
+            readable_time_unit,
+        )